@@ -30,9 +30,11 @@ import numpy as np
 
 from akg.global_configs import get_kernel_meta_path
 from akg.utils.gen_random import random_gaussian, gen_indices, gen_csr_indices
-from akg.utils.op_dsl import get_attr, op_dsl
+from akg.utils.op_dsl import get_attr, op_dsl, numexpr_dsl
 
 RANDOM_SEED_NUM = 20
+# elementwise ops whose DefaultFormat input is reshaped to match a FRACTAL_NZ input
+ELEMWISE_OP_SET = frozenset(["TensorAdd", "Add", "RealDiv", "Mul", "Minimum", "Maximum", "Sub"])
 MakeIndices = namedtuple("MakeIndices", "name data_shape indices_shape indices_dtype attrs")
 
 
@@ -434,19 +436,224 @@ def _emit_reshape(fractal_tensor, default_tensor):
     return sent_reshape_tensor
 
 
+def _emit_op(op, commands):
+    """Emit one op."""
+    op_name = op["name"]
+    input_desc = op["input_desc"]
+    output_desc = op["output_desc"]
+    dsl_fun = op_dsl.get(op_name, None)
+    if dsl_fun is None:
+        raise ValueError("op [%s] is not supported!" % op_name)
+    if op_name in ELEMWISE_OP_SET and output_desc[0].get("format") == "FRACTAL_NZ":
+        need_reshape, fractal_tensor, default_tensor = _check_need_reshape(input_desc)
+        if need_reshape:
+            commands.append(_emit_reshape(fractal_tensor, default_tensor))
+    commands.append(dsl_fun(input_desc, output_desc, op["attr"]))
+
+
+def _get_fuse_backend():
+    """Get the backend that fuses chains of elementwise ops, None if ops are not fused."""
+    backend = os.environ.get("FUSE_ELEMWISE_EXPECT")
+    if backend == "1":
+        backend = "numexpr"
+    if backend not in ("numexpr", "numba"):
+        return None
+    try:
+        __import__(backend)
+    except ImportError:
+        logging.warning("FUSE_ELEMWISE_EXPECT is set but %s is not installed, ops are not fused.", backend)
+        return None
+    return backend
+
+
+def _is_fusible_op(op):
+    """Check if op is a float32 elementwise op with a numexpr expression."""
+    if op["name"] not in numexpr_dsl or op["output_desc"][0].get("format") == "FRACTAL_NZ":
+        return False
+    tensors = [tensor for input_desc in op["input_desc"] for tensor in input_desc] + op["output_desc"]
+    for tensor in tensors:
+        if tensor["data_type"] != "float32":
+            return False
+        value = tensor.get("value", None)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or
+                                  not math.isfinite(value)):
+            return False
+    return True
+
+
+def _emit_fused(name, fused, backend, imported, commands):
+    """Emit a fused elementwise expression, or the op itself if nothing was fused into it.
+
+    imported holds the modules already imported by earlier fused statements of the same graph.
+    """
+    expr, operands, op_num, op = fused
+    if op_num == 1:
+        _emit_op(op, commands)
+        return
+    local_dict = ", ".join("'%s': %s" % (operand, operand) for operand in sorted(operands))
+    if backend == "numba":
+        commands.append("%s = numba_evaluate('%s', {%s})" % (name, expr, local_dict))
+        return
+    if "numexpr" not in imported:
+        imported.add("numexpr")
+        commands.append("import numexpr")
+    commands.append("%s = numexpr.evaluate('%s', local_dict={%s}).astype(np.float32)" % (name, expr, local_dict))
+
+
+def _count_uses(desc):
+    """Count how many op inputs read each tensor, and collect the graph output names."""
+    use_count = {}
+    for op in desc["op_desc"]:
+        for input_desc in op["input_desc"]:
+            for tensor in input_desc:
+                use_count[tensor["tensor_name"]] = use_count.get(tensor["tensor_name"], 0) + 1
+    graph_outputs = {output["tensor_name"] for output in desc["output_desc"]}
+    return use_count, graph_outputs
+
+
+def _gen_fused_op_compute(desc, backend, commands):
+    """Generate op compute, fusing chains of elementwise ops into one numexpr or numba expression."""
+    # numexpr accepts a limited number of array operands per expression
+    max_operands = 31
+    use_count, graph_outputs = _count_uses(desc)
+    # tensor name -> (expression, operand names, number of fused ops, last op), not emitted yet
+    pending = {}
+    imported = set()
+
+    def flush():
+        for name, fused in pending.items():
+            _emit_fused(name, fused, backend, imported, commands)
+        pending.clear()
+
+    for op in desc["op_desc"]:
+        if not _is_fusible_op(op):
+            flush()
+            _emit_op(op, commands)
+            continue
+        args = []
+        operands = set()
+        op_num = 1
+        for input_desc in op["input_desc"]:
+            tensor = input_desc[0]
+            name = tensor["tensor_name"]
+            if name in pending and len(operands | pending[name][1]) > max_operands:
+                # too many operands to inline, compute the producer on its own
+                _emit_fused(name, pending.pop(name), backend, imported, commands)
+            if name in pending:
+                expr, names, num, _ = pending.pop(name)
+                args.append(expr)
+                operands.update(names)
+                op_num += num
+            elif tensor.get("value", None) is not None:
+                args.append("(%r)" % tensor["value"])
+            else:
+                args.append(name)
+                operands.add(name)
+        out_name = op["output_desc"][0]["tensor_name"]
+        fused = (numexpr_dsl[op["name"]].format(**{"a%d" % i: arg for i, arg in enumerate(args)}),
+                 operands, op_num, op)
+        # a tensor read by only one later op can stay an expression and be inlined into it
+        if use_count.get(out_name, 0) == 1 and out_name not in graph_outputs and len(operands) < max_operands:
+            pending[out_name] = fused
+        else:
+            _emit_fused(out_name, fused, backend, imported, commands)
+    flush()
+
+
+def _mark_readonly_tiles(desc):
+    """Mark Tile outputs that are neither graph outputs nor passed to an op that may write its inputs.
+
+    The Tile ops of the returned op list are copies, desc itself is not changed.
+    """
+    writer_ops = ("Assign", "InplaceAssign", "TensorScatterAdd", "Custom")
+    # the output of these ops may share memory with their first input
+    view_ops = ("Reshape", "EquivFormat", "Cast", "ExpandDims", "Squeeze", "Transpose", "StridedSlice")
+    written = {output["tensor_name"] for output in desc["output_desc"]}
+    for op in desc["op_desc"]:
+        if op["name"] in writer_ops:
+            written.update(tensor["tensor_name"] for input_desc in op["input_desc"] for tensor in input_desc)
+    # a write through a view writes its input too, views are consumed after they are produced
+    for op in reversed(desc["op_desc"]):
+        if op["name"] in view_ops and op["output_desc"][0]["tensor_name"] in written:
+            written.add(op["input_desc"][0][0]["tensor_name"])
+    op_desc = []
+    for op in desc["op_desc"]:
+        if op["name"] == "Tile":
+            output = dict(op["output_desc"][0], readonly=op["output_desc"][0]["tensor_name"] not in written)
+            op = dict(op, output_desc=[output] + op["output_desc"][1:])
+        op_desc.append(op)
+    return op_desc
+
+
+def _rebound_name(op):
+    """Get the name of the input tensor that the code emitted for op assigns to, None if there is none."""
+    if op["name"] in ("Assign", "InplaceAssign"):
+        return op["input_desc"][0][0]["tensor_name"]
+    if op["name"] in ELEMWISE_OP_SET and op["output_desc"][0].get("format") == "FRACTAL_NZ":
+        need_reshape, _, default_tensor = _check_need_reshape(op["input_desc"])
+        if need_reshape:
+            return default_tensor["tensor_name"]
+    return None
+
+
+def _fold_reciprocal(desc):
+    """Fold Reciprocal into its only consumer.
+
+    Mul(y, Reciprocal(x)) becomes RealDiv(y, x) and Reciprocal(Sqrt(x)) becomes Rsqrt(x).
+    """
+    use_count, graph_outputs = _count_uses(desc)
+
+    def no_fractal(op):
+        # a FRACTAL_NZ elementwise op may reshape its inputs in place, which must not hit a shared tensor
+        tensors = [input_desc[0] for input_desc in op["input_desc"]] + op["output_desc"]
+        return all(tensor.get("format") != "FRACTAL_NZ" for tensor in tensors)
+
+    def foldable(op):
+        out_name = op["output_desc"][0]["tensor_name"]
+        return use_count.get(out_name, 0) == 1 and out_name not in graph_outputs and no_fractal(op)
+
+    # output name -> Sqrt or Reciprocal op that may be folded into its consumer
+    producers = {}
+    folded = set()
+    op_desc = []
+    for op in desc["op_desc"]:
+        # a folded op reads its input later, after the name has been assigned to
+        rebound = _rebound_name(op)
+        if rebound is not None:
+            producers = {name: producer for name, producer in producers.items()
+                         if producer["input_desc"][0][0]["tensor_name"] != rebound}
+        names = [input_desc[0]["tensor_name"] for input_desc in op["input_desc"]]
+        if op["name"] == "Mul" and len(names) == 2 and names[0] != names[1] and no_fractal(op):
+            for i, name in enumerate(names):
+                recip = producers.get(name)
+                if recip is not None and recip["name"] == "Reciprocal":
+                    op = {"name": "RealDiv", "input_desc": [op["input_desc"][1 - i], recip["input_desc"][0]],
+                          "output_desc": op["output_desc"], "attr": []}
+                    folded.add(id(recip))
+                    break
+        elif op["name"] == "Reciprocal":
+            sqrt = producers.get(names[0])
+            if sqrt is not None and sqrt["name"] == "Sqrt":
+                op = {"name": "Rsqrt", "input_desc": sqrt["input_desc"], "output_desc": op["output_desc"],
+                      "attr": []}
+                folded.add(id(sqrt))
+        if op["name"] in ("Reciprocal", "Sqrt") and op["input_desc"][0][0].get("value", None) is None and \
+                foldable(op):
+            producers[op["output_desc"][0]["tensor_name"]] = op
+        op_desc.append(op)
+    return [op for op in op_desc if id(op) not in folded]
+
+
 def _gen_op_compute(desc, commands):
     """Generate op compute."""
-    elemwise_op_list = ["TensorAdd", "Add", "RealDiv", "Mul", "Minimum", "Maximum", "Sub"]
+    desc = dict(desc, op_desc=_fold_reciprocal(desc))
+    desc = dict(desc, op_desc=_mark_readonly_tiles(desc))
+    backend = _get_fuse_backend()
+    if backend is not None:
+        _gen_fused_op_compute(desc, backend, commands)
+        return
     for op in desc["op_desc"]:
-        dsl_fun = op_dsl.get(op["name"], None)
-        if dsl_fun is None:
-            raise ValueError("op [%s] is not supported!" % op["name"])
-        if op["name"] in elemwise_op_list and op["output_desc"][0].get("format") == "FRACTAL_NZ":
-            need_reshape, fractal_tensor, default_tensor = _check_need_reshape(op["input_desc"])
-            if need_reshape:
-                commands.append(_emit_reshape(fractal_tensor, default_tensor))
-        sent = dsl_fun(op['input_desc'], op['output_desc'], op['attr'])
-        commands.append(sent)
+        _emit_op(op, commands)
 
 
 def _update_inplace_tensors(infos, output_indexes, commands):
@@ -14,9 +14,10 @@
 
 """Provides op numpy implementation, used to compare with akg output."""
 
+import functools
 import logging
 import inspect
-from copy import deepcopy
+import types
 import numpy as np
 
 
@@ -29,68 +30,110 @@ def get_attr(attr_desc, attr_type):
     return []
 
 
+def _attr_dict(attr_desc):
+    """get op attrs as a dict, used by emitters that query many attrs"""
+    return {attr["name"]: attr["value"] for attr in attr_desc}
+
+
 def get_input(desc):
     """get input values"""
     value = desc.get('value', None)
     return value if value is not None else desc['tensor_name']
 
 
+def _index_rows(data, indices):
+    """get the row of data.reshape(-1, tail) addressed by each index tuple and whether it is in bound"""
+    index_num = indices.shape[-1]
+    tail = int(np.prod(data.shape[index_num:]))
+    # data is C contiguous, so the element stride of each indexed axis is a multiple of tail
+    strides = np.array(data.strides[:index_num]) // data.itemsize // max(tail, 1)
+    inbound = ((indices >= 0) & (indices < np.array(data.shape[:index_num]))).all(axis=1)
+    return indices.dot(strides), inbound
+
+
 def gather_nd_np(data, indices):
     """numpy implementation of gather_nd"""
-    data_shape = data.shape
-    indices_shape = indices.shape
-    new_indices = indices.reshape(-1, indices.shape[-1])
-    left_shape = indices_shape[:-1]
-    right_shape = data_shape[int(indices_shape[-1]):]
-    out_shape = left_shape + right_shape
-    out = np.zeros(out_shape, np.float32).reshape(new_indices.shape[0], -1)
-    new_data = deepcopy(data).reshape(-1, int(np.prod(data_shape[int(indices_shape[-1]):])))
-    for i in range(new_indices.shape[0]):
-        for j in range(out.shape[1]):
-            index_read = [i, 0]
-            index_write = [0, 0]
-            inbound = True
-            for k in range(0, int(indices_shape[-1])):
-                temp_idx = new_indices[i, k]
-                inbound = np.all((inbound, (temp_idx >= 0), (temp_idx < data_shape[k])))
-                index_write[0] += int(temp_idx * data.strides[k] / data.itemsize)
-                index_write[0] = int(index_write[0] / out.shape[1])
-            index_read[1] = j
-            if inbound:
-                index_write[1] = j
-                out[tuple(index_read)] = new_data[tuple(index_write)]
+    # gather only reads data, so a contiguous input is used in place and the row strides stay valid
+    data = np.ascontiguousarray(data)
+    index_num = int(indices.shape[-1])
+    new_indices = indices.reshape(-1, index_num)
+    right_shape = data.shape[index_num:]
+    out_shape = indices.shape[:-1] + right_shape
+    new_data = data.reshape(-1, int(np.prod(right_shape)))
+    # out of bound rows are filled with zero
+    rows, inbound = _index_rows(data, new_indices)
+    out = new_data.take(np.where(inbound, rows, 0), axis=0)
+    out[~inbound] = 0
     return out.reshape(out_shape)
 
 
 def tensor_scatter_add_np(data, indices, updates):
     """numpy implementation of tensor_scatter_add"""
     data_shape = data.shape
-    indices_shape = indices.shape
+    out = data.copy()
     if indices.ndim > 1:
         new_indices = indices.reshape(-1, indices.shape[-1])
-        out = deepcopy(data).reshape(-1, int(np.prod(data_shape[int(indices_shape[-1]):])))
     else:
         new_indices = indices.reshape(-1, 1)
-        out = deepcopy(data).reshape(-1, int(np.prod(data_shape[1:])))
+    rows, inbound = _index_rows(out, new_indices)
+    out = out.reshape(-1, int(np.prod(data_shape[new_indices.shape[1]:])))
     new_updates = updates.reshape(new_indices.shape[0], -1)
-    for i in range(new_indices.shape[0]):
-        for j in range(out.shape[1]):
-            index_read = [i, 0]
-            index_write = [0, 0]
-            inbound = True
-            for k in range(0, int(indices_shape[-1])):
-                temp_idx = new_indices[i, k]
-                inbound = np.all((inbound, (temp_idx >= 0), (temp_idx < data_shape[k])))
-                index_write[0] += int(temp_idx * data.strides[k] / data.itemsize)
-                index_write[0] = int(index_write[0] / out.shape[1])
-            index_read[1] = j
-            if inbound:
-                index_write[1] = j
-                temp = new_updates[tuple(index_read)] + out[tuple(index_write)]
-                out[tuple(index_write)] = temp
+    # out of bound index tuples are skipped, duplicated ones are accumulated by np.add.at
+    np.add.at(out, rows[inbound], new_updates[inbound])
     return out.reshape(data_shape)
 
 
+def unsorted_segment_sum_np(data, segment_ids, num_segments):
+    """numpy implementation of unsorted_segment_sum"""
+    tail_shape = list(data.shape[segment_ids.ndim:])
+    ids = segment_ids.reshape(-1)
+    data = data.reshape(ids.size, int(np.prod(tail_shape)))
+    # ids out of [0, num_segments) do not contribute to any segment
+    valid = (ids >= 0) & (ids < num_segments)
+    ids, data = ids[valid], data[valid]
+    if data.shape[1] == 1:
+        out = np.bincount(ids, weights=data[:, 0], minlength=num_segments).astype(np.float64)
+    else:
+        # sum the contiguous runs of the sorted ids, then scatter the run sums to their segments
+        out = np.zeros((num_segments, data.shape[1]))
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        if ids.size > 0 and data.shape[1] > 0:
+            starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+            out[ids[starts]] = np.add.reduceat(data[order].astype(np.float64), starts, axis=0)
+    return out.reshape([num_segments] + tail_shape)
+
+
+def add_n_np(inputs):
+    """numpy implementation of addn"""
+    out = np.asarray(np.add(inputs[0], inputs[1]))
+    for x in inputs[2:]:
+        # accumulate in place unless x would broadcast or promote the partial sum
+        if out.ndim > 0 and np.broadcast(out, x).shape == out.shape and np.result_type(out, x) == out.dtype:
+            np.add(out, x, out=out)
+        else:
+            out = out + x
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _numba_ufunc(expr, names):
+    """compile a float32 elementwise expression of names into a parallel numba ufunc"""
+    import numba
+    funcs = ("sqrt", "exp", "expm1", "log", "sin", "cos", "tanh", "arcsin", "arccos", "arcsinh", "arccosh", "arctan2")
+    scope = {func: getattr(np, func) for func in funcs}
+    kernel = eval("lambda %s: %s" % (", ".join(names), expr), scope)
+    signature = "float32(%s)" % ", ".join(["float32"] * len(names))
+    return numba.vectorize([signature], target="parallel")(kernel)
+
+
+def numba_evaluate(expr, local_dict):
+    """evaluate a numexpr style expression of the arrays in local_dict in float32 with a compiled numba ufunc"""
+    names = tuple(sorted(local_dict))
+    # some helpers such as unsorted_segment_sum_np return float64 for float32 tensors
+    return _numba_ufunc(expr, names)(*[np.asarray(local_dict[name], np.float32) for name in names])
+
+
 def gather_np(data, indices, axis):
     """numpy implementation of gather"""
     expect = np.take(data, indices, axis)
@@ -113,56 +156,37 @@ def csrmm_np(indptr, indices, data, weight, shape):
     return np.asarray(expect)
 
 
+def _csr_row_ids(indptr):
+    """get the row id of every stored element of a csr matrix"""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
 def csr_reduce_sum_np(indptr, indices, data, shape, axis):
     """numpy implementation of csr_reduce_sum"""
-    import scipy.sparse
     axis = axis % len(shape)
     x = data.reshape(data.shape[0], -1)
-    expect = []
-    for i in range(x.shape[-1]):
-        sparse = scipy.sparse.csr_matrix((x[..., i], indices, indptr), shape=shape[:2])
-        out = np.array(sparse.sum(axis))
-        expect.append(out.data)
-    expect = np.moveaxis(np.stack(expect, 0).reshape(shape[2:] + [shape[1 - axis]]), -1, 0)
-    return expect.reshape([shape[0], 1] + shape[2:])
+    # sum up all trailing columns at once, grouped by row (axis 1) or by column (axis 0) of each element
+    segment_ids = _csr_row_ids(indptr) if axis == 1 else indices
+    expect = np.zeros((shape[1 - axis], x.shape[-1]), x.dtype)
+    np.add.at(expect, segment_ids, x)
+    return np.expand_dims(expect.reshape([shape[1 - axis]] + list(shape[2:])), axis)
 
 
 def csr_mul_np(indptr, indices, sparse_data, dense, shape):
     """numpy implementation of csr_mul"""
-    import scipy.sparse
-    x = sparse_data.reshape(sparse_data.shape[0], -1)
-    y = np.broadcast_to(dense, shape).reshape(shape[0], shape[1], -1)
-    expect = []
-    for i in range(x.shape[-1]):
-        sparse = scipy.sparse.csr_matrix((x[..., i], indices, indptr), shape=shape[:2])
-        out = sparse.multiply(y[..., i])
-        expect.append(out.data)
-    expect = np.moveaxis(np.stack(expect, 0).reshape(shape[2:] + [sparse_data.shape[0]]), -1, 0)
-    return expect
+    y = np.broadcast_to(dense, shape)[_csr_row_ids(indptr), indices]
+    return np.multiply(sparse_data, y)
 
 
 def csr_div_np(indptr, indices, sparse_data, dense, shape):
     """numpy implementation of csr_div"""
-    import scipy.sparse
-    x = sparse_data.reshape(sparse_data.shape[0], -1)
-    y = np.broadcast_to(dense, shape).reshape(shape[0], shape[1], -1)
-    expect = []
-    for i in range(x.shape[-1]):
-        sparse = scipy.sparse.csr_matrix((x[..., i], indices, indptr), shape=shape[:2])
-        out = sparse.multiply(np.divide(1, y[..., i]))
-        expect.append(out.data)
-    expect = np.moveaxis(np.stack(expect, 0).reshape(shape[2:] + [sparse_data.shape[0]]), -1, 0)
-    return expect
+    y = np.broadcast_to(dense, shape)[_csr_row_ids(indptr), indices]
+    return np.multiply(sparse_data, np.divide(1, y))
 
 
 def csr_gather_np(indptr, indices, dense, shape):
     """numpy implementation of csr_gather"""
-    import scipy.sparse
-    sparse_data = scipy.sparse.csr_matrix((np.zeros(indices.shape), indices, indptr), shape[:2])
-    coo = sparse_data.tocoo()
-    coo_idx = np.stack((coo.row, coo.col))
-    expect = dense[tuple(coo_idx.tolist())]
-    return expect
+    return dense[_csr_row_ids(indptr), indices]
 
 
 def one_hot_np(data, axis, on_value, off_value, depth, dtype):
@@ -170,24 +194,9 @@ def one_hot_np(data, axis, on_value, off_value, depth, dtype):
     shape = data.shape
     if axis < 0:
         axis = axis + len(shape) + 1
-    out_shape = [i for i in shape]
-    out_shape.insert(axis, depth)
-    expect = np.full(out_shape, off_value)
-    dims = []
-    for dim in shape:
-        dims.append(list(range(dim)))
-    import itertools
-    indexs = [x for x in itertools.product(*tuple(dims))]
-    indexs = [list(x) for x in indexs]
-    temp = 0
-    flatinput = data.flatten()
-    for value in flatinput:
-        indexs[temp].insert(axis, value)
-        temp = temp + 1
-    indexs = [tuple(x) for x in indexs]
-    for loc in indexs:
-        if loc[axis] >= 0:
-            expect[loc] = on_value
+    # negative or too large indices match no position along depth and get off_value
+    hot = np.expand_dims(data, -1) == np.arange(depth)
+    expect = np.moveaxis(np.where(hot, on_value, off_value), -1, axis)
     expect = expect.astype(dtype)
     return expect
 
@@ -202,16 +211,15 @@ def reduce_str(inputs, output, attr, op_type):
     keepdims_value = get_attr(attr, "keep_dims")
     keepdims = keepdims_value if keepdims_value else keepdims
 
+    out = output[0]['tensor_name']
+    a = get_input(inputs[0][0])
+    # fp16 inputs are accumulated in fp32
+    data = f"{a}.astype(np.float32) if {a}.dtype == np.float16 else {a}"
     if not axis:
-        s = "%s = np.%s(%s.astype(np.float32) if %s.dtype == np.float16 else %s, keepdims=%s).astype(%s.dtype)" % (
-            output[0]['tensor_name'], op_type, get_input(inputs[0][0]), get_input(inputs[0][0]),
-            get_input(inputs[0][0]), keepdims, get_input(inputs[0][0]))
+        s = f"{out} = np.{op_type}({data}, keepdims={keepdims}).astype({a}.dtype)"
     else:
-        s = "%s = np.%s(%s.astype(np.float32) if %s.dtype == np.float16 else %s, axis=tuple(%s), keepdims=%s)" \
-            ".astype(%s.dtype); %s = np.reshape(%s, %s) " % \
-            (output[0]['tensor_name'], op_type, get_input(inputs[0][0]), get_input(inputs[0][0]),
-             get_input(inputs[0][0]), axis, keepdims, get_input(inputs[0][0]),
-             output[0]['tensor_name'], output[0]['tensor_name'], output[0]['shape'])
+        s = f"{out} = np.{op_type}({data}, axis=tuple({axis}), keepdims={keepdims}).astype({a}.dtype); " \
+            f"{out} = np.reshape({out}, {output[0]['shape']}) "
     return s
 
 
@@ -221,7 +229,8 @@ def cast_str(inputs, output, attr):
     if inputs[0][0].get('value', None) is not None:
         s = "%s = np.array(%s).astype(np.%s)" % (output[0]['tensor_name'], get_input(inputs[0][0]), dst_type)
     else:
-        s = "%s = %s.astype(np.%s)" % (output[0]['tensor_name'], get_input(inputs[0][0]), dst_type)
+        # casting to the same dtype keeps the input array instead of copying it
+        s = "%s = %s.astype(np.%s, copy=False)" % (output[0]['tensor_name'], get_input(inputs[0][0]), dst_type)
     return s
 
 
@@ -243,18 +252,20 @@ def transpose_str(inputs, output, attr):
     return s
 
 def concat_str(inputs, output, attr):
+    """gen concat string"""
     axis = get_attr(attr, 'axis')
-    inputs_list = []
-    for i in range(len(inputs[0])):
-        inputs_list.append(get_input(inputs[0][i]))
-    s = '{} = np.concatenate(({}), axis={})'.format(output[0]['tensor_name'], ', '.join(inputs_list), axis)
-    return s
-    
+    out = output[0]['tensor_name']
+    inputs_list = ', '.join(str(get_input(desc)) for desc in inputs[0])
+    if not output[0]['shape'] or any(desc.get('value', None) is not None for desc in inputs[0]):
+        return f"{out} = np.concatenate([{inputs_list}], axis={axis})"
+    # write the inputs straight into an output of the known shape and dtype
+    return f"{out} = np.empty({output[0]['shape']}, dtype='{output[0]['data_type']}')\n" \
+           f"np.concatenate([{inputs_list}], axis={axis}, out={out})"
+
 
 def trans_data_two2fractal(input_, src_format, dst_format):
     """two2fractal"""
     shape = list(input_.shape)
-    dtype = input_.dtype
     if src_format == "DefaultFormat" or src_format == "NCHW":
         m, n = shape[-2], shape[-1]
         m1, n1 = m // 16, n // 16
@@ -262,16 +273,8 @@ def trans_data_two2fractal(input_, src_format, dst_format):
         need_pad = m % 16 != 0 or n % 16 != 0
         if need_pad:
             pad_m, pad_n = (m + 15) // 16 * 16, (n + 15) // 16 * 16
-            pad_shape = [x for x in shape]
-            pad_shape[-1] = pad_n
-            pad_shape[-2] = pad_m
-            pad_input = np.zeros(pad_shape).astype(dtype)
-            if len(shape) == 2:
-                pad_input[:m, :n] = input_
-            elif len(shape) == 3:
-                pad_input[:, :m, :n] = input_
-            elif len(shape) == 4:
-                pad_input[:, :, :m, :n] = input_
+            pad_width = [(0, 0)] * (len(shape) - 2) + [(0, pad_m - m), (0, pad_n - n)]
+            pad_input = np.pad(input_, pad_width, mode='constant')
             m1, n1 = pad_m // 16, pad_n // 16
             reshape_shape = shape[:-2] + [m1, m0, n1, n0]
             reshape_input = pad_input.reshape(reshape_shape)
@@ -310,6 +313,12 @@ def trans_data_fractal2two(input_, shape_origin):
     return bench_mark
 
 
+@functools.lru_cache(maxsize=None)
+def _get_source(func):
+    """get the source code of func, read from file only once"""
+    return inspect.getsource(func)
+
+
 def get_trans_data_str(input_name, output_name, ori_shape, src_format, dst_format):
     """gen trans_data string"""
     support_formats = [("DefaultFormat", "FRACTAL_NZ"),
@@ -322,11 +331,11 @@ def get_trans_data_str(input_name, output_name, ori_shape, src_format, dst_forma
                          (src_format, dst_format))
 
     if (src_format == 'DefaultFormat' or src_format == "NCHW") and dst_format == 'FRACTAL_NZ':
-        res = "%s \n%s = %s(%s, '%s', '%s')" % (inspect.getsource(trans_data_two2fractal),
+        res = "%s \n%s = %s(%s, '%s', '%s')" % (_get_source(trans_data_two2fractal),
                                                 output_name, trans_data_two2fractal.__name__, input_name,
                                                 src_format, dst_format)
     elif src_format == 'FRACTAL_NZ' and (dst_format == 'DefaultFormat' or dst_format == "NCHW"):
-        res = "%s \n%s = %s(%s, %s)" % (inspect.getsource(trans_data_fractal2two),
+        res = "%s \n%s = %s(%s, %s)" % (_get_source(trans_data_fractal2two),
                                         output_name, trans_data_fractal2two.__name__, input_name, ori_shape)
     else:
         raise ValueError("src_format(%s) and dst_format(%s) is not supported!" % (src_format, dst_format))
@@ -347,33 +356,27 @@ def np_matmul_str(inputs, output, attr):
     """gen matmul string"""
     trans_a = get_attr(attr, "transpose_a")
     trans_b = get_attr(attr, "transpose_b")
-    input_0 = inputs[0][0]
-    input_1 = inputs[1][0]
-    res = ""
+    out = output[0]['tensor_name']
+    a = get_input(inputs[0][0])
+    b = get_input(inputs[1][0])
+    res = []
     # Because when matmul calculations are performed on Gpu and Ascend, fp32 is used for accumulation when
     # the input data is fp16, so the input data is casted to fp32
-    if input_0['data_type'] == "float16":
-        tmp = "%s = %s.astype(np.float32)" % (get_input(input_0), get_input(input_0))
-        res = res + tmp + "\n"
-    if input_1['data_type'] == "float16":
-        tmp = "%s = %s.astype(np.float32)" % (get_input(input_1), get_input(input_1))
-        res = res + tmp + "\n"
-
-    if trans_a and trans_b:
-        res += "%s = np.matmul(np.swapaxes(%s, -1, -2), np.swapaxes(%s, -1, -2))" % \
-               (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]))
-    elif trans_a:
-        res += "%s = np.matmul(np.swapaxes(%s, -1, -2), %s)" % \
-               (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]))
-    elif trans_b:
-        res += "%s = np.matmul(%s, np.swapaxes(%s, -1, -2))" % \
-               (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]))
+    if inputs[0][0]['data_type'] == "float16":
+        res.append(f"{a} = {a}.astype(np.float32)")
+    if inputs[1][0]['data_type'] == "float16":
+        res.append(f"{b} = {b}.astype(np.float32)")
+
+    if trans_a or trans_b:
+        # let einsum contract the transposed operands directly instead of swapping their axes first
+        lhs = "...ji" if trans_a else "...ij"
+        rhs = "...kj" if trans_b else "...jk"
+        res.append(f"{out} = np.einsum('{lhs},{rhs}->...ik', {a}, {b}, optimize=True)")
     else:
-        res += "%s = np.matmul(%s, %s)" % \
-               (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]))
+        res.append(f"{out} = np.matmul({a}, {b})")
     if output[0]['data_type'] == "float16":
-        res += "\n" + "%s = %s.astype(np.float16)" % (output[0]['tensor_name'], output[0]['tensor_name'])
-    return res
+        res.append(f"{out} = {out}.astype(np.float16)")
+    return "\n".join(res)
 
 
 def convert_fracal_shape(ori_shape, fractal):
@@ -385,63 +388,51 @@ def convert_fracal_shape(ori_shape, fractal):
         return ori_shape[:-4] + (ori_shape[-4] * ori_shape[-2], ori_shape[-3] * ori_shape[-1])
 
 
+def _last_set_bit(mask, n):
+    """index of the highest bit set in mask below n, -1 if none"""
+    mask &= (1 << n) - 1
+    return mask.bit_length() - 1
+
+
 def strided_slice_str(inputs, output, attr):
     """gen strided_slice string"""
-    begin = get_attr(attr, "begin")
-    end = get_attr(attr, "end")
-    strides = get_attr(attr, "strides")
+    attrs = _attr_dict(attr)
+    begin = attrs.get("begin", [])
+    end = attrs.get("end", [])
+    strides = attrs.get("strides", [])
     shape = inputs[0][0]["shape"]
-    begin_pos = bin(get_attr(attr, "begin_mask"))[-1:1:-1]
-    end_pos = bin(get_attr(attr, "end_mask"))[-1:1:-1]
-    ellipsis_pos = bin(get_attr(attr, "ellipsis_mask"))[-1:1:-1]
-    new_axis_pos = bin(get_attr(attr, "new_axis_mask"))[-1:1:-1]
-    shrink_axis_pos = bin(get_attr(attr, "shrink_axis_mask"))[-1:1:-1]
-    new_axis = -1
-    shrink_axis = -1
-    slice_str = ""
-    for i, bg in enumerate(begin):
-        if i < len(begin_pos) and begin_pos[i] == '1':
-            # use the largest range
-            start_num = 0 if strides[i] >= 0 else -1
-        else:
-            start_num = bg
-        if i < len(end_pos) and end_pos[i] == '1':
-            # use the largest range
-            end_num = shape[i] if strides[i] >= 0 else -shape[i] - 1
-        else:
-            end_num = end[i]
-        if i < len(ellipsis_pos) and ellipsis_pos[i] == '1':
-            # do not change on this axis
-            start_num = 0
-            end_num = shape[i]
-            strides_num = 1
-        else:
-            strides_num = strides[i]
-        if i < len(new_axis_pos) and new_axis_pos[i] == '1':
-            # insert a new axis and ignore slice
-            start_num = 0
-            end_num = shape[i]
-            strides_num = 1
-            new_axis = i
-        else:
-            strides_num = strides[i]
-        if i < len(shrink_axis_pos) and shrink_axis_pos[i] == '1':
-            # delete an axis
-            end_num = start_num + 1
-            strides_num = 1
-            shrink_axis = i
-        else:
-            strides_num = strides[i]
-        slice_str += str(start_num) + ':' + str(end_num) + ':' + str(strides_num)
-        if not i == len(begin) - 1:
-            slice_str += ","
-    res = "%s = %s[%s]" % (output[0]['tensor_name'], get_input(inputs[0][0]), slice_str)
+    begin_mask = attrs.get("begin_mask", [])
+    end_mask = attrs.get("end_mask", [])
+    ellipsis_mask = attrs.get("ellipsis_mask", [])
+    new_axis_mask = attrs.get("new_axis_mask", [])
+    shrink_axis_mask = attrs.get("shrink_axis_mask", [])
+    n = len(begin)
+    bits = np.arange(n)
+    shape = np.array(shape[:n], dtype=np.int64)
+    strides = np.array(strides[:n], dtype=np.int64)
+    begin_on = ((begin_mask >> bits) & 1).astype(bool)
+    end_on = ((end_mask >> bits) & 1).astype(bool)
+    # ellipsis and new axes keep the whole axis
+    keep_on = ((ellipsis_mask >> bits) & 1).astype(bool) | ((new_axis_mask >> bits) & 1).astype(bool)
+    shrink_on = ((shrink_axis_mask >> bits) & 1).astype(bool)
+    # masked begin/end use the largest range
+    start_num = np.where(begin_on, np.where(strides >= 0, 0, -1), np.array(begin, dtype=np.int64))
+    end_num = np.where(end_on, np.where(strides >= 0, shape, -shape - 1), np.array(end[:n], dtype=np.int64))
+    start_num = np.where(keep_on, 0, start_num)
+    end_num = np.where(keep_on, shape, end_num)
+    end_num = np.where(shrink_on, start_num + 1, end_num)
+    strides_num = np.where(keep_on | shrink_on, 1, strides)
+    new_axis = _last_set_bit(new_axis_mask, n)
+    shrink_axis = _last_set_bit(shrink_axis_mask, n)
+    slices = ["%s:%s:%s" % t for t in zip(start_num.tolist(), end_num.tolist(), strides_num.tolist())]
+    res = ["%s = %s[%s]" % (output[0]['tensor_name'], get_input(inputs[0][0]), ",".join(slices))]
     if new_axis != -1:
-        res += "\n%s = np.expand_dims(%s, axis=%s)" % (
-            output[0]['tensor_name'], output[0]['tensor_name'], str(new_axis))
+        res.append("%s = np.expand_dims(%s, axis=%s)" % (
+            output[0]['tensor_name'], output[0]['tensor_name'], str(new_axis)))
     if shrink_axis != -1:
-        res += "\n%s = np.squeeze(%s, axis=%s)" % (output[0]['tensor_name'], output[0]['tensor_name'], str(shrink_axis))
-    return res
+        res.append("%s = np.squeeze(%s, axis=%s)" % (
+            output[0]['tensor_name'], output[0]['tensor_name'], str(shrink_axis)))
+    return "\n".join(res)
 
 
 def func_pack(func_name, func_body, params, ret):
@@ -455,14 +446,10 @@ def func_pack(func_name, func_body, params, ret):
 
 def matmul_str(inputs, output, attr):
     """gen matmul string"""
-    left_format = get_attr(attr, "left_format")
-    if not left_format:
-        left_format = get_attr(attr, "pri_format")
-    right_format = get_attr(attr, "right_format")
-    if not right_format:
-        right_format = get_attr(attr, "pri_format")
-    trans_a = get_attr(attr, "transpose_a")
-    trans_b = get_attr(attr, "transpose_b")
+    attrs = _attr_dict(attr)
+    left_format = attrs.get("left_format") or attrs.get("pri_format", [])
+    right_format = attrs.get("right_format") or attrs.get("pri_format", [])
+    trans_b = attrs.get("transpose_b", [])
     left_input = inputs[0][0]
     right_input = inputs[1][0]
     output_name = output[0]['tensor_name']
@@ -472,35 +459,34 @@ def matmul_str(inputs, output, attr):
 
     left_input_name = get_input(left_input)
     right_input_name = get_input(right_input)
-    res = ''
+    res = []
     if left_format == 'FRACTAL_NZ':
         left_ori_shape = convert_fracal_shape(left_input['shape'], "zN")
         left_trans_str = get_trans_data_str(left_input_name, left_input_name, left_ori_shape, left_format,
                                             'DefaultFormat')
-        res = res + left_trans_str + "\n"
+        res.append(left_trans_str)
     if right_format == 'FRACTAL_NZ':
         right_ori_shape = convert_fracal_shape(right_input['shape'], "zN")
         right_trans_str = get_trans_data_str(right_input_name, right_input_name, right_ori_shape, right_format,
                                              'DefaultFormat')
-        res = res + right_trans_str + "\n"
-    mm_str = np_matmul_str(inputs, output, attr)
-    res = res + mm_str + "\n"
+        res.append(right_trans_str)
+    res.append(np_matmul_str(inputs, output, attr))
 
     has_bias = (len(inputs) > 2)
     if has_bias:
         bias = inputs[2][0]
         bias_shape = right_ori_shape[-2] if trans_b else right_ori_shape[-1]
         if bias['shape'][0] != bias_shape:
-            res += "%s = random_gaussian([%s, ], miu=1, sigma=0.1).astype(np.%s) \n" % (
-                get_input(bias), str(bias_shape), bias['data_type'])
+            res.append("%s = random_gaussian([%s, ], miu=1, sigma=0.1).astype(np.%s)" % (
+                get_input(bias), str(bias_shape), bias['data_type']))
 
-        res += "%s = np.add(%s, %s)\n" % (output_name, output_name, get_input(bias))
+        res.append("%s = np.add(%s, %s)" % (output_name, output_name, get_input(bias)))
     if output_format != 'DefaultFormat':
         output_trans_str = get_trans_data_str(output_name, output_name, output_shape, 'DefaultFormat', output_format)
-        res = res + output_trans_str + "\n"
+        res.append(output_trans_str)
     func_name = "matmul_func"
     params = [get_input(i[0]) for i in inputs]
-    func = func_pack(func_name, res, params, output_name)
+    func = func_pack(func_name, "\n".join(res), params, output_name)
     return func + "%s = %s(%s)\n" % (output_name, func_name, ','.join(params))
 
 
@@ -513,6 +499,57 @@ def custom_str(inputs, output, attr):
     return func + "%s = %s(%s)\n" % (output_name, func_name, ','.join(params))
 
 
+@functools.lru_cache(maxsize=None)
+def _conv_2d_kernel():
+    """jit the conv_2d loop nest with numba, None if numba is not installed"""
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def kernel(data_pad, weight, out, s_h, s_w, d_h, d_w):
+        n, out_h, out_w, out_c = out.shape
+        _, kh, kw, c = weight.shape
+        # parallel over all output pixels, so that small batches still use every core
+        for pixel in numba.prange(n * out_h * out_w):  # pylint: disable=not-an-iterable
+            b, hw = divmod(np.int64(pixel), out_h * out_w)
+            i, j = divmod(hw, out_w)
+            for f in range(out_c):
+                acc = np.float32(0)
+                for x in range(kh):
+                    for y in range(kw):
+                        for k in range(c):
+                            acc += data_pad[b, i * s_h + x * d_h, j * s_w + y * d_w, k] * weight[f, x, y, k]
+                out[b, i, j, f] = acc
+    return kernel
+
+
+def conv_2d_np(data_pad, weight, stride, dilation, out_shape):
+    """numpy implementation of conv_2d on padded NHWC data, accumulated in float32"""
+    s_h, s_w = stride
+    d_h, d_w = dilation
+    data_pad = np.ascontiguousarray(data_pad, np.float32)
+    weight = np.ascontiguousarray(weight, np.float32)
+    n, out_h, out_w, _ = out_shape
+    _, kh, kw, c = weight.shape
+    if (out_h - 1) * s_h + (kh - 1) * d_h >= data_pad.shape[1] or \
+            (out_w - 1) * s_w + (kw - 1) * d_w >= data_pad.shape[2]:
+        raise ValueError("conv_2d output shape %s exceeds the padded input %s" % (out_shape, data_pad.shape))
+    kernel = _conv_2d_kernel()
+    if kernel is not None:
+        out = np.empty(out_shape, np.float32)
+        kernel(data_pad, weight, out, s_h, s_w, d_h, d_w)
+        return out
+    # a strided view of all (kh, kw, c) windows, contracted against the filter in one fused einsum
+    strides = data_pad.strides
+    patches = np.lib.stride_tricks.as_strided(
+        data_pad, (n, out_h, out_w, kh, kw, c),
+        (strides[0], strides[1] * s_h, strides[2] * s_w, strides[1] * d_h, strides[2] * d_w, strides[3]),
+        writeable=False)
+    return np.einsum('nijxyc,fxyc->nijf', patches, weight, optimize=True)
+
+
 def conv_2d_str(inputs, output, attr):
     """gen conv_2d string"""
     support_list = {"float16": 'np.float16', "float32": 'np.float32'}
@@ -521,41 +558,32 @@ def conv_2d_str(inputs, output, attr):
     shape_filter = inputs[1][0]['shape']
     shape_filter_name = inputs[1][0]['tensor_name']
     dtype = inputs[0][0]['data_type']
-    padding = get_attr(attr, "pad_list")
+    attrs = _attr_dict(attr)
+    padding = attrs.get("pad_list", [])
     has_pad = np.sum(padding) > 0
-    stride = get_attr(attr, "stride")[2:]
-    dilation = get_attr(attr, "dilation")[2:]
+    stride = attrs.get("stride", [])[2:]
+    dilation = attrs.get("dilation", [])[2:]
     out_dtype = output[0]["data_type"]
     output_name = output[0]["tensor_name"]
 
-    res = ""
-    res += "n, h, w, c = {} \n".format(shape_data)
-    res += "out_c, kh, kw, c = {}\n".format(shape_filter)
-    res += "s_h, s_w = {}\n".format(stride)
-    res += "d_h, d_w = {}\n".format(dilation)
-    res += "p_l, p_r, p_t, p_b = {}\n".format(padding)
-    res += "out_h = (h + p_t + p_b - kh) // s_h + 1\n"
-    res += "out_w = (w + p_l + p_r - kw) // s_w + 1\n"
-
-    res += "out_shape = (n, out_h, out_w, out_c)\n"
-    res += "shape_data_pad = (n, h + p_t + p_b, w + p_l + p_r, c)\n"
-
-    res += "data_pad = np.zeros(shape_data_pad).astype({})\n".format(support_list.get(dtype))
+    res = ["n, h, w, c = {}".format(shape_data),
+           "out_c, kh, kw, c = {}".format(shape_filter),
+           "s_h, s_w = {}".format(stride),
+           "d_h, d_w = {}".format(dilation),
+           "p_l, p_r, p_t, p_b = {}".format(padding),
+           "out_h = (h + p_t + p_b - kh) // s_h + 1",
+           "out_w = (w + p_l + p_r - kw) // s_w + 1",
+           "out_shape = (n, out_h, out_w, out_c)",
+           "shape_data_pad = (n, h + p_t + p_b, w + p_l + p_r, c)",
+           "data_pad = np.zeros(shape_data_pad).astype({})".format(support_list.get(dtype))]
     if has_pad:
-        res += ("data_pad[:, p_t:p_t+h, p_l:p_l+w, :] = {}\n".format(shape_data_name))
+        res.append("data_pad[:, p_t:p_t+h, p_l:p_l+w, :] = {}".format(shape_data_name))
     else:
-        res += ("data_pad = {}\n".format(shape_data_name))
-
-    res += "whd = (kh - 1) * d_h + 1\n"
-    res += "wwd = (kw - 1) * d_w + 1\n"
-    res += "{} = np.zeros(out_shape).astype({})\n".format(output_name, support_list.get(out_dtype))
-    res += "for i in range(out_h):\n"
-    res += "    for j in range(out_w):\n"
-    res += "        for f in range(out_c):\n"
-    res += ("            {}[:, i, j, f] = np.sum(data_pad[:, i*s_h:i*s_h+whd:d_h, j*s_w:j*s_w+wwd:d_w, :]"
-            ".astype('float32') *{}[f, :, :, :].astype('float32'),axis=(1, 2, 3))\n"
-            .format(output_name, shape_filter_name))
-    return res
+        res.append("data_pad = {}".format(shape_data_name))
+
+    res.append("{} = conv_2d_np(data_pad, {}, (s_h, s_w), (d_h, d_w), out_shape).astype({})".format(
+        output_name, shape_filter_name, support_list.get(out_dtype)))
+    return "\n".join(res)
 
 
 def pad_str(inputs, output, attr):
@@ -573,15 +601,61 @@ def unpad_str(inputs, output, attr):
     """gen unpad string"""
     input_shape = inputs[0][0]['shape']
     unpad_after = get_attr(attr, "tail")
-    res = ""
-    res += "m, n = {} - {}, {} - {}\n".format(input_shape[-2], unpad_after[-2], input_shape[-1], unpad_after[-1])
-    res += "if {} == 4:\n".format(len(input_shape))
-    res += "    %s = %s[:, :, :m, :n]\n" % (
-        output[0]['tensor_name'], get_input(inputs[0][0]))
-    res += "elif {} == 2:\n".format(len(input_shape))
-    res += "    %s = %s[:m, :n]\n" % (
-        output[0]['tensor_name'], get_input(inputs[0][0]))
-    return res
+    out = output[0]['tensor_name']
+    a = get_input(inputs[0][0])
+    res = ["m, n = {} - {}, {} - {}".format(input_shape[-2], unpad_after[-2], input_shape[-1], unpad_after[-1]),
+           "if {} == 4:".format(len(input_shape)),
+           "    {} = {}[:, :, :m, :n]".format(out, a),
+           "elif {} == 2:".format(len(input_shape)),
+           "    {} = {}[:m, :n]".format(out, a)]
+    return "\n".join(res)
+
+
+def addn_str(inputs, output, attr):
+    """gen addn string"""
+    names = [str(get_input(desc)) for desc in inputs[0]]
+    if len(names) <= 2:
+        return "%s = %s" % (output[0]['tensor_name'], " + ".join(names))
+    return "%s = add_n_np([%s])" % (output[0]['tensor_name'], ", ".join(names))
+
+
+def zeros_like_str(inputs, output, attr):
+    """gen zeros_like string"""
+    desc = inputs[0][0]
+    if desc.get('value', None) is not None:
+        return f"{output[0]['tensor_name']} = np.zeros_like({get_input(desc)})"
+    # shape and dtype are known from the desc, so the input array is not needed,
+    # scalar inputs are generated with shape [1]
+    shape = str(desc['shape']) if desc['shape'] else "[1]"
+    return f"{output[0]['tensor_name']} = np.zeros({shape}, dtype='{desc['data_type']}')"
+
+
+def tile_str(inputs, output, attr):
+    """gen tile string"""
+    multiples = list(get_attr(attr, "multiples"))
+    shape = list(inputs[0][0]["shape"])
+    rank = max(len(shape), len(multiples))
+    shape = [1] * (rank - len(shape)) + shape
+    multiples = [1] * (rank - len(multiples)) + multiples
+    # a tile that only repeats size 1 axes of a tensor that is never written is a read only broadcast view
+    if output[0].get("readonly", False) and all(dim == 1 or mul == 1 for dim, mul in zip(shape, multiples)):
+        dst_shape = tuple(dim * mul for dim, mul in zip(shape, multiples))
+        return f"{output[0]['tensor_name']} = np.broadcast_to({get_input(inputs[0][0])}, {dst_shape})"
+    return f"{output[0]['tensor_name']} = np.tile({get_input(inputs[0][0])}, {get_attr(attr, 'multiples')})"
+
+
+def select_str(inputs, output, attr, cond_fmt):
+    """gen select string, cond_fmt builds the condition from the leading inputs"""
+    cond_num = len(inputs) - 2
+    cond = cond_fmt.format(*[get_input(desc[0]) for desc in inputs[:cond_num]])
+    out = output[0]['tensor_name']
+    a, b = [desc[0] for desc in inputs[cond_num:]]
+    same_layout = all(desc.get('value', None) is None and desc['shape'] == output[0]['shape'] and
+                      desc['data_type'] == output[0]['data_type'] for desc in (a, b))
+    if not same_layout or (cond_num == 1 and inputs[0][0]['data_type'] != "bool"):
+        return f"{out} = np.where({cond}, {get_input(a)}, {get_input(b)})"
+    # both branches are full arrays: copy one and overwrite the selected elements with the other
+    return f"{out} = np.array({get_input(b)})\nnp.copyto({out}, {get_input(a)}, where={cond})"
 
 
 def cummulative_str(inputs, outputs, attr, op_type):
@@ -589,26 +663,143 @@ def cummulative_str(inputs, outputs, attr, op_type):
     exclusive = get_attr(attr, "exclusive")
     reverse = get_attr(attr, "reverse")
     axis = get_attr(attr, "axis")
-    input_shape = inputs[0][0]['shape']
-    res = ""
-    res += "axis = {}\n".format(axis)
+    a = get_input(inputs[0][0])
+    res = [f"axis = {axis}"]
     if reverse:
-        res += "out = np.flip({}, axis)\n".format(get_input(inputs[0][0]))
-        res += "out = np.{}(out, axis)\n".format(op_type)
+        res.append(f"out = np.flip({a}, axis)")
+        res.append(f"out = np.{op_type}(out, axis)")
     else:
-        res += "out = np.{}({}, axis)\n".format(op_type, get_input(inputs[0][0]))
+        res.append(f"out = np.{op_type}({a}, axis)")
     if exclusive:
-        res += "from scipy.ndimage.interpolation import shift\n"
-        res += "shift_axis = [0] * {}\n".format(len(input_shape))
-        res += "shift_axis[axis] = 1\n"
-        res += "out = shift(out, shift_axis)\n"
+        # shift by one along axis and fill the head with zero
+        res.append("out = np.roll(out, 1, axis)")
+        res.append("np.moveaxis(out, axis, 0)[0] = 0")
     if reverse:
-        res += "out = np.flip(out, axis=axis)\n"
-    res += "{} = out\n".format(outputs[0]['tensor_name'])
-    return res
+        res.append("out = np.flip(out, axis=axis)")
+    res.append("{} = out".format(outputs[0]['tensor_name']))
+    return "\n".join(res)
+
+
+# elementwise and other single line ops: op name -> (template, number of inputs)
+# {o} is the output name, {t} the output data type and {a0}, {a1}, ... are the input names
+_OP_TEMPLATES = {
+    "Sin": ("{o} = np.sin({a0})", 1),
+    "Cos": ("{o} = np.cos({a0})", 1),
+    "Asin": ("{o} = np.arcsin({a0})", 1),
+    "ACos": ("{o} = np.arccos({a0})", 1),
+    "Sign": ("{o} = np.sign({a0})", 1),
+    "IsNan": ("{o} = np.isnan({a0})", 1),
+    "IsInf": ("{o} = np.isinf({a0})", 1),
+    "IsFinite": ("{o} = np.isfinite({a0})", 1),
+    "Tanh": ("{o} = np.tanh({a0})", 1),
+    "Rsqrt": ("{o} = 1.0/np.sqrt({a0})", 1),
+    "Neg": ("{o} = np.negative({a0})", 1),
+    "Floor": ("{o} = np.floor({a0})", 1),
+    "Exp": ("{o} = np.exp({a0})", 1),
+    "Log": ("{o} = np.log({a0})", 1),
+    "Sqrt": ("{o} = np.sqrt({a0})", 1),
+    "Reciprocal": ("{o} = np.divide(1.0, {a0})", 1),
+    "Abs": ("{o} = np.absolute({a0})", 1),
+    "EquivFormat": ("{o} = {a0}", 1),
+    "Asinh": ("{o} = np.arcsinh({a0})", 1),
+    "Acosh": ("{o} = np.arccosh({a0})", 1),
+    "Expm1": ("{o} = np.expm1({a0})", 1),
+    "LogicalNot": ("{o} = np.logical_not({a0})", 1),
+    "Erf": ("from scipy.special import erf\n{o} = erf({a0})", 1),
+    "CImag": ("{o} = np.imag({a0})", 1),
+    "CReal": ("{o} = np.real({a0})", 1),
+    "ElemAny": ("{o} = np.asarray([({a0} > 0).any()], dtype=np.{t})", 1),
+    "Mul": ("{o} = np.multiply({a0}, {a1})", 2),
+    "Pow": ("{o} = np.power({a0}, {a1})", 2),
+    "Sub": ("{o} = np.subtract({a0}, {a1})", 2),
+    "TensorAdd": ("{o} = np.add({a0}, {a1})", 2),
+    "Add": ("{o} = np.add({a0}, {a1})", 2),
+    "RealDiv": ("{o} = np.divide({a0}, {a1})", 2),
+    "Div": ("{o} = np.divide({a0}, {a1})", 2),
+    "FloorDiv": ("{o} = np.floor_divide({a0}, {a1})", 2),
+    "Mod": ("{o} = np.fmod({a0}, {a1})", 2),
+    "FloorMod": ("{o} = np.mod({a0}, {a1})", 2),
+    "Minimum": ("{o} = np.minimum({a0}, {a1})", 2),
+    "Maximum": ("{o} = np.maximum({a0}, {a1})", 2),
+    "Equal": ("{o} = np.equal({a0}, {a1})", 2),
+    "NotEqual": ("{o} = np.not_equal({a0}, {a1})", 2),
+    "GreaterEqual": ("{o} = np.greater_equal({a0}, {a1})", 2),
+    "Greater": ("{o} = np.greater({a0}, {a1})", 2),
+    "LessEqual": ("{o} = np.less_equal({a0}, {a1})", 2),
+    "Less": ("{o} = np.less({a0}, {a1})", 2),
+    "Atan2": ("{o} = np.arctan2({a0}, {a1})", 2),
+    "LogicalAnd": ("{o} = np.logical_and({a0}, {a1})", 2),
+    "LogicalOr": ("{o} = np.logical_or({a0}, {a1})", 2),
+    "GatherNd": ("{o} = gather_nd_np({a0}, {a1})", 2),
+    "Complex": ("{o} = ({a0} + 1j * {a1}).astype(np.{t})", 2),
+    "Assign": ("{a0} = {a1}; {o} = {a1}", 2),
+    "InplaceAssign": ("{a0} = {a1}; {o} = {a2}", 3),
+    "TensorScatterAdd": ("{o} = tensor_scatter_add_np({a0}, {a1}, {a2})", 3),
+}
+
+
+# numexpr expressions of elementwise ops, used to fuse chains of them into a single evaluate call,
+# numba_evaluate compiles the same expressions
+numexpr_dsl = {
+    "Add": "({a0} + {a1})",
+    "TensorAdd": "({a0} + {a1})",
+    "Sub": "({a0} - {a1})",
+    "Mul": "({a0} * {a1})",
+    "RealDiv": "({a0} / {a1})",
+    "Div": "({a0} / {a1})",
+    "Pow": "({a0} ** {a1})",
+    "Atan2": "arctan2({a0}, {a1})",
+    "Neg": "(-{a0})",
+    "Abs": "abs({a0})",
+    "Reciprocal": "(1 / {a0})",
+    "Sqrt": "sqrt({a0})",
+    "Rsqrt": "(1 / sqrt({a0}))",
+    "Exp": "exp({a0})",
+    "Expm1": "expm1({a0})",
+    "Log": "log({a0})",
+    "Sin": "sin({a0})",
+    "Cos": "cos({a0})",
+    "Tanh": "tanh({a0})",
+    "Asin": "arcsin({a0})",
+    "ACos": "arccos({a0})",
+    "Asinh": "arcsinh({a0})",
+    "Acosh": "arccosh({a0})",
+}
+
+
+# ops computed by a numpy helper: op name -> (helper, attrs passed after the inputs)
+_OP_CALLS = {
+    "UnsortedSegmentSum": ("unsorted_segment_sum_np", ("num_segments",)),
+    "Gather": ("gather_np", ("axis",)),
+    "CSRMV": ("csrmv_np", ("dense_shape",)),
+    "CSRReduceSum": ("csr_reduce_sum_np", ("dense_shape", "axis")),
+    "CSRMul": ("csr_mul_np", ("dense_shape",)),
+    "CSRDiv": ("csr_div_np", ("dense_shape",)),
+    "CSRGather": ("csr_gather_np", ("dense_shape",)),
+    "CSRMM": ("csrmm_np", ("dense_shape",)),
+}
+
+
+def _emit(render, arg_keys, inputs, output, attr, _get_input=get_input):
+    """gen op string with render, the bound format_map of the op template"""
+    # get_input is bound as a default arg so that it is a local lookup in the loop
+    args = {"o": output[0]['tensor_name'], "t": output[0]['data_type']}
+    for key, desc in zip(arg_keys, inputs):
+        args[key] = _get_input(desc[0])
+    return render(args)
+
+
+def _emit_call(func, attr_names, inputs, output, attr, _get_input=get_input, _get_attr=get_attr):
+    """gen string calling func with all inputs followed by attrs"""
+    args = []
+    for desc in inputs:
+        args.append(str(_get_input(desc[0])))
+    for name in attr_names:
+        args.append(str(_get_attr(attr, name)))
+    return f"{output[0]['tensor_name']} = {func}({', '.join(args)})"
 
 
-op_dsl = {
+_op_dsl = {
     "Custom": lambda inputs, output, attr: custom_str(inputs, output, attr),
     "ReduceSum": lambda inputs, output, attr: reduce_str(inputs, output, attr, "sum"),
     "ReduceMax": lambda inputs, output, attr: reduce_str(inputs, output, attr, "max"),
@@ -617,210 +808,35 @@ op_dsl = {
     "StridedSlice": lambda inputs, output, attr: strided_slice_str(inputs, output, attr),
     "CumSum": lambda inputs, output, attr: cummulative_str(inputs, output, attr, "cumsum"),
     "CumProd": lambda inputs, output, attr: cummulative_str(inputs, output, attr, "cumprod"),
-    "Sin": lambda inputs, output, attr: "%s = np.sin(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Cos": lambda inputs, output, attr: "%s = np.cos(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Asin": lambda inputs, output, attr: "%s = np.arcsin(%s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "ACos": lambda inputs, output, attr: "%s = np.arccos(%s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Sign": lambda inputs, output, attr: "%s = np.sign(%s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "IsNan": lambda inputs, output, attr: "%s = np.isnan(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "IsInf": lambda inputs, output, attr: "%s = np.isinf(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "IsFinite": lambda inputs, output, attr: "%s = np.isfinite(%s)" %
-                                             (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Tanh": lambda inputs, output, attr: "%s = np.tanh(%s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Mul": lambda inputs, output, attr: "%s = np.multiply(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "Pow": lambda inputs, output, attr: "%s = np.power(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "Sub": lambda inputs, output, attr: "%s = np.subtract(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "TensorAdd": lambda inputs, output, attr: "%s = np.add(%s, %s)" %
-                                              (output[0]['tensor_name'], get_input(
-                                                  inputs[0][0]), get_input(inputs[1][0])),
-    "Add": lambda inputs, output, attr: "%s = np.add(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "Rsqrt": lambda inputs, output, attr: "%s = 1.0/np.sqrt(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Neg": lambda inputs, output, attr: "%s = np.negative(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Floor": lambda inputs, output, attr: "%s = np.floor(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Exp": lambda inputs, output, attr: "%s = np.exp(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "RealDiv": lambda inputs, output, attr: "%s = np.divide(%s, %s)" %
-                                            (output[0]['tensor_name'], get_input(
-                                                inputs[0][0]), get_input(inputs[1][0])),
-    "Div": lambda inputs, output, attr: "%s = np.divide(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "FloorDiv": lambda inputs, output, attr: "%s = np.floor_divide(%s, %s)" %
-                                             (output[0]['tensor_name'], get_input(
-                                                 inputs[0][0]), get_input(inputs[1][0])),
-    "Mod": lambda inputs, output, attr: "%s = np.fmod(%s, %s)" %
-                                        (output[0]['tensor_name'], get_input(
-                                            inputs[0][0]), get_input(inputs[1][0])),
-    "FloorMod": lambda inputs, output, attr: "%s = np.mod(%s, %s)" %
-                                             (output[0]['tensor_name'], get_input(
-                                                 inputs[0][0]), get_input(inputs[1][0])),
-    "Minimum": lambda inputs, output, attr: "%s = np.minimum(%s, %s)" %
-                                            (output[0]['tensor_name'], get_input(
-                                                inputs[0][0]), get_input(inputs[1][0])),
-    "Maximum": lambda inputs, output, attr: "%s = np.maximum(%s, %s)" %
-                                            (output[0]['tensor_name'], get_input(
-                                                inputs[0][0]), get_input(inputs[1][0])),
-    "Log": lambda inputs, output, attr: "%s = np.log(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Sqrt": lambda inputs, output, attr: "%s = np.sqrt(%s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0])),
     "Cast": lambda inputs, output, attr: cast_str(inputs, output, attr),
-    "Reshape": lambda inputs, output, attr: "%s = np.reshape(%s, %s)" %
-                                            (output[0]['tensor_name'], get_input(inputs[0][0]), output[0]['shape']),
-    "OneHot": lambda inputs, output, attr: "%s = one_hot_np(%s, %s, %s, %s, %s, np.%s)" %
-                                           (output[0]['tensor_name'], get_input(inputs[0][0]), get_attr(attr, "axis"),
-                                            get_input(inputs[1][0]),
-                                            get_input(inputs[2][0]), get_attr(attr, "depth"), output[0]['data_type']),
-    "ZerosLike": lambda inputs, output, attr: "%s = np.zeros_like(%s)" %
-                                              (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "AddN": lambda inputs, output, attr: "%s = %s" %
-                                         (output[0]['tensor_name'], ' + '.join([get_input(inputs[0][i])
-                                                                                for i in range(0, len(inputs[0]))])),
-    "Tile": lambda inputs, output, attr: "%s = np.tile(%s, %s)" %
-                                         (output[0]['tensor_name'], get_input(
-                                             inputs[0][0]), get_attr(attr, "multiples")),
-    "Reciprocal": lambda inputs, output, attr: "%s = np.divide(1.0, %s)" %
-                                               (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Equal": lambda inputs, output, attr: "%s = np.equal(%s, %s)" %
-                                          (output[0]['tensor_name'], get_input(
-                                              inputs[0][0]), get_input(inputs[1][0])),
-    "NotEqual": lambda inputs, output, attr: "%s = np.not_equal(%s, %s)" %
-                                             (output[0]['tensor_name'], get_input(
-                                                 inputs[0][0]), get_input(inputs[1][0])),
-    "GreaterEqual": lambda inputs, output, attr: "%s = np.greater_equal(%s, %s)" %
-                                                 (output[0]['tensor_name'], get_input(
-                                                     inputs[0][0]), get_input(inputs[1][0])),
-    "Select": lambda inputs, output, attr: "%s = np.where(%s, %s, %s)" %
-                                           (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                            get_input(inputs[1][0]), get_input(inputs[2][0])),
-    "InplaceAssign": lambda inputs, output, attr: "%s = %s; %s = %s" %
-                                                  (get_input(inputs[0][0]), get_input(inputs[1][0]),
-                                                   output[0]['tensor_name'], get_input(inputs[2][0])),
-    "Greater": lambda inputs, output, attr: "%s = np.greater(%s, %s)" %
-                                            (output[0]['tensor_name'], get_input(
-                                                inputs[0][0]), get_input(inputs[1][0])),
-    "SelectGT": lambda inputs, output, attr: "%s = np.where(%s > %s, %s, %s)" %
-                                             (
-                                                 output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                 get_input(inputs[1][0]),
-                                                 get_input(inputs[2][0]), get_input(inputs[3][0])),
-    "SelectLT": lambda inputs, output, attr: "%s = np.where(%s < %s, %s, %s)" %
-                                             (
-                                                 output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                 get_input(inputs[1][0]),
-                                                 get_input(inputs[2][0]), get_input(inputs[3][0])),
-    "Abs": lambda inputs, output, attr: "%s = np.absolute(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "LessEqual": lambda inputs, output, attr: "%s = np.less_equal(%s, %s)" %
-                                              (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                               get_input(inputs[1][0])),
-    "Less": lambda inputs, output, attr: "%s = np.less(%s, %s)" %
-                                         (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0])),
-    "EquivFormat": lambda inputs, output, attr: "%s = %s" %
-                                                (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "ExpandDims": lambda inputs, output, attr: "%s = np.expand_dims(%s, %s)" %
-                                               (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                get_attr(attr, "axis")),
-    "ElemAny": lambda inputs, output, attr: "%s = (%s.all() > 0).astype(np.%s).reshape(1)" %
-                                               (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                output[0]['data_type']),
+    "Reshape": lambda inputs, output, attr:
+        f"{output[0]['tensor_name']} = np.reshape({get_input(inputs[0][0])}, {output[0]['shape']})",
+    "OneHot": lambda inputs, output, attr:
+        f"{output[0]['tensor_name']} = one_hot_np({get_input(inputs[0][0])}, {get_attr(attr, 'axis')}, "
+        f"{get_input(inputs[1][0])}, {get_input(inputs[2][0])}, {get_attr(attr, 'depth')}, "
+        f"np.{output[0]['data_type']})",
+    "AddN": lambda inputs, output, attr: addn_str(inputs, output, attr),
+    "Tile": lambda inputs, output, attr: tile_str(inputs, output, attr),
+    "ZerosLike": lambda inputs, output, attr: zeros_like_str(inputs, output, attr),
+    "ExpandDims": lambda inputs, output, attr:
+        f"{output[0]['tensor_name']} = np.expand_dims({get_input(inputs[0][0])}, {get_attr(attr, 'axis')})",
     "Transpose": lambda inputs, output, attr: transpose_str(inputs, output, attr),
     "TransData": trans_data_dsl,
     "BroadcastTo": lambda inputs, output, attr: broadcast_str(inputs, output, attr),
     "BatchMatMul": lambda inputs, output, attr: matmul_str(inputs, output, attr),
-    "Assign": lambda inputs, output, attr: "%s = %s; %s = %s" %
-                                           (get_input(inputs[0][0]), get_input(inputs[1][0]), output[0]['tensor_name'],
-                                            get_input(inputs[1][0])),
     "MatMul": lambda inputs, output, attr: matmul_str(inputs, output, attr),
     "Conv2D": lambda inputs, output, attr: conv_2d_str(inputs, output, attr),
     "PadAkg": lambda inputs, output, attr: pad_str(inputs, output, attr),
     "UnPadAkg": lambda inputs, output, attr: unpad_str(inputs, output, attr),
-    "Asinh": lambda inputs, output, attr: "%s = np.arcsinh(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Acosh": lambda inputs, output, attr: "%s = np.arccosh(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "Atan2": lambda inputs, output, attr: "%s = np.arctan2(%s, %s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0])),
-    "Expm1": lambda inputs, output, attr: "%s = np.expm1(%s)" %
-                                          (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "LogicalNot": lambda inputs, output, attr: "%s = np.logical_not(%s)" %
-                                               (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "LogicalAnd": lambda inputs, output, attr: "%s = np.logical_and(%s, %s)" %
-                                               (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                get_input(inputs[1][0])),
-    "LogicalOr": lambda inputs, output, attr: "%s = np.logical_or(%s, %s)" %
-                                              (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                               get_input(inputs[1][0])),
-    "Erf": lambda inputs, output, attr: "%s = sp.special.erf(%s)" %
-                                        (output[0]['tensor_name'], get_input(inputs[0][0])),
-    "TensorScatterAdd": lambda inputs, output, attr: "%s = tensor_scatter_add_np(%s, %s, %s)" %
-                                                     (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                      get_input(inputs[1][0]),
-                                                      get_input(inputs[2][0])),
-    "GatherNd": lambda inputs, output, attr: "%s = %s[tuple(%s.transpose().tolist())]" %
-                                             (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                              get_input(inputs[1][0])),
-    "UnsortedSegmentSum": lambda inputs, output, attr: "%s = np.zeros([%s,] + %s[%s:]);  np.add.at(%s, %s, %s)" %
-                                                       (output[0]['tensor_name'], get_attr(attr, 'num_segments'),
-                                                        inputs[0][0]['shape'], len(inputs[1][0]['shape']),
-                                                        output[0]['tensor_name'], get_input(inputs[1][0]),
-                                                        get_input(inputs[0][0])),
-    "Gather": lambda inputs, output, attr: "%s = gather_np(%s, %s, %s)" %
-                                           (output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]),
-                                            get_attr(attr, "axis")),
-    "StandardNormal": lambda inputs, output, attr: "%s = np.random.standard_normal(%s)" %
-                                                   (output[0]['tensor_name'], get_attr(attr, "shape")),
-    "CSRMV": lambda inputs, output, attr: "{} = csrmv_np({}, {}, {}, {}, {})".format(
-                                           output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]),
-                                           get_input(inputs[2][0]),
-                                           get_input(inputs[3][0]), get_attr(attr, "dense_shape")),
-    "CSRReduceSum": lambda inputs, output, attr: "{} = csr_reduce_sum_np({}, {}, {}, {}, {})".format(
-                                                  output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                  get_input(inputs[1][0]), get_input(inputs[2][0]),
-                                                  get_attr(attr, "dense_shape"), get_attr(attr, "axis")),
-    "CSRMul": lambda inputs, output, attr: "{} = csr_mul_np({}, {}, {}, {}, {})".format(
-                                                  output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                  get_input(inputs[1][0]), get_input(inputs[2][0]),
-                                                  get_input(inputs[3][0]), get_attr(attr, "dense_shape")),
-    "CSRDiv": lambda inputs, output, attr: "{} = csr_div_np({}, {}, {}, {}, {})".format(
-                                                  output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                  get_input(inputs[1][0]), get_input(inputs[2][0]),
-                                                  get_input(inputs[3][0]), get_attr(attr, "dense_shape")),
-    "CSRGather": lambda inputs, output, attr: "{} = csr_gather_np({}, {}, {}, {})".format(
-                                                  output[0]['tensor_name'], get_input(inputs[0][0]),
-                                                  get_input(inputs[1][0]), get_input(inputs[2][0]),
-                                                  get_attr(attr, "dense_shape")),
-    "CSRMM": lambda inputs, output, attr: "{} = csrmm_np({}, {}, {}, {}, {})".format(
-                                           output[0]['tensor_name'], get_input(inputs[0][0]), get_input(inputs[1][0]),
-                                           get_input(inputs[2][0]),
-                                           get_input(inputs[3][0]), get_attr(attr, "dense_shape")),
-    "CImag": lambda inputs, output, attr: "%s = np.imag(%s)" %
-    (output[0]['tensor_name'], get_input(inputs[0][0])),
-
-    "CReal": lambda inputs, output, attr: "%s = np.real(%s)" %
-    (output[0]['tensor_name'], get_input(inputs[0][0])),
-
-    "Complex": lambda inputs, output, attr: "%s = np.vectorize(complex)(%s, %s)" %
-    (output[0]['tensor_name'], get_input(inputs[0][0]),
-                                               get_input(inputs[1][0])),
-    "Concat": lambda inputs, output, attr: concat_str(inputs, output, attr)
+    "StandardNormal": lambda inputs, output, attr:
+        f"{output[0]['tensor_name']} = np.random.standard_normal({get_attr(attr, 'shape')})",
+    "Concat": lambda inputs, output, attr: concat_str(inputs, output, attr),
+    "Select": lambda inputs, output, attr: select_str(inputs, output, attr, "{0}"),
+    "SelectGT": lambda inputs, output, attr: select_str(inputs, output, attr, "{0} > {1}"),
+    "SelectLT": lambda inputs, output, attr: select_str(inputs, output, attr, "{0} < {1}"),
 }
+_op_dsl.update({op: functools.partial(_emit, template.format_map, tuple("a%d" % i for i in range(arity)))
+                for op, (template, arity) in _OP_TEMPLATES.items()})
+_op_dsl.update({op: functools.partial(_emit_call, func, attr_names) for op, (func, attr_names) in _OP_CALLS.items()})
+# read only view of all op emitters
+op_dsl = types.MappingProxyType(_op_dsl)
@@ -23,6 +23,8 @@ casefiles=(
 "${CURRPATH}/pass/test_promote_if.py"
 "${CURRPATH}/pass/test_sink_if.py"
 "${CURRPATH}/pass/test_copy_propagation.py"
+"${CURRPATH}/utils/test_fold_reciprocal.py"
+"${CURRPATH}/utils/test_fuse_elemwise.py"
 )
 
 for case in ${casefiles[@]}
@@ -0,0 +1,146 @@
+# Copyright 2021 Huawei Technologies Co., Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from akg.utils.composite_op_helper import _fold_reciprocal, _gen_op_compute
+
+
+def _tensor(name, shape, fmt="DefaultFormat"):
+    return {"tensor_name": name, "shape": shape, "data_type": "float32", "format": fmt}
+
+
+def _op(name, inputs, output):
+    return {"name": name, "input_desc": [[i] for i in inputs], "output_desc": [output], "attr": []}
+
+
+def _run(desc, inputs):
+    commands = []
+    _gen_op_compute(desc, commands)
+    scope = dict(inputs, np=np)
+    exec("\n".join(commands), scope)
+    return [scope[output["tensor_name"]] for output in desc["output_desc"]]
+
+
+def test_fold_reciprocal_mul():
+    '''
+     r = Reciprocal(x)
+     o = Mul(y, r)
+
+     ==>
+
+     o = RealDiv(y, x)
+    '''
+    x, y = _tensor("x", [4, 8]), _tensor("y", [4, 8])
+    desc = {"op_desc": [_op("Reciprocal", [x], _tensor("r", [4, 8])),
+                        _op("Mul", [y, _tensor("r", [4, 8])], _tensor("o", [4, 8]))],
+            "output_desc": [_tensor("o", [4, 8])]}
+    op_desc = _fold_reciprocal(desc)
+    assert [op["name"] for op in op_desc] == ["RealDiv"]
+    assert [i[0]["tensor_name"] for i in op_desc[0]["input_desc"]] == ["y", "x"]
+
+    data = {"x": np.random.uniform(1, 2, (4, 8)), "y": np.random.uniform(1, 2, (4, 8))}
+    assert np.allclose(_run(desc, data)[0], data["y"] / data["x"])
+
+
+def test_fold_reciprocal_fractal_mul():
+    '''
+     a FRACTAL_NZ Mul reshapes its DefaultFormat input in place, so x must stay untouched
+
+     r = Reciprocal(x)
+     o = Mul(y, r)      (y and o are FRACTAL_NZ)
+     z = Add(x, w)
+    '''
+    x = _tensor("x", [1, 32])
+    y = _tensor("y", [2, 2, 16, 16], "FRACTAL_NZ")
+    desc = {"op_desc": [_op("Reciprocal", [x], _tensor("r", [1, 32])),
+                        _op("Mul", [y, _tensor("r", [1, 32])], _tensor("o", [2, 2, 16, 16], "FRACTAL_NZ")),
+                        _op("Add", [x, _tensor("w", [1, 32])], _tensor("z", [1, 32]))],
+            "output_desc": [_tensor("o", [2, 2, 16, 16], "FRACTAL_NZ"), _tensor("z", [1, 32])]}
+    assert [op["name"] for op in _fold_reciprocal(desc)] == ["Reciprocal", "Mul", "Add"]
+
+    data = {"x": np.random.uniform(1, 2, (1, 32)), "y": np.random.uniform(1, 2, (2, 2, 16, 16)),
+            "w": np.random.uniform(1, 2, (1, 32))}
+    _, z = _run(desc, data)
+    assert np.allclose(z, data["x"] + data["w"])
+
+
+def test_fold_reciprocal_fractal_rebind():
+    '''
+     a FRACTAL_NZ Mul between Reciprocal and its consumer rebinds x to a reshaped array, so r is not folded
+
+     r = Reciprocal(x)
+     f = Mul(w, x)      (w and f are FRACTAL_NZ)
+     o = Mul(y, r)
+    '''
+    x, y = _tensor("x", [1, 32]), _tensor("y", [1, 32])
+    w = _tensor("w", [2, 2, 16, 16], "FRACTAL_NZ")
+    desc = {"op_desc": [_op("Reciprocal", [x], _tensor("r", [1, 32])),
+                        _op("Mul", [w, x], _tensor("f", [2, 2, 16, 16], "FRACTAL_NZ")),
+                        _op("Mul", [y, _tensor("r", [1, 32])], _tensor("o", [1, 32]))],
+            "output_desc": [_tensor("f", [2, 2, 16, 16], "FRACTAL_NZ"), _tensor("o", [1, 32])]}
+    assert [op["name"] for op in _fold_reciprocal(desc)] == ["Reciprocal", "Mul", "Mul"]
+
+    data = {"x": np.random.uniform(1, 2, (1, 32)), "y": np.random.uniform(1, 2, (1, 32)),
+            "w": np.random.uniform(1, 2, (2, 2, 16, 16))}
+    _, o = _run(desc, data)
+    assert np.allclose(o, data["y"] / data["x"])
+
+
+def test_fold_reciprocal_assign_rebind():
+    '''
+     InplaceAssign between Reciprocal and its consumer rebinds x, so r is not folded
+
+     r = Reciprocal(x)
+     a = InplaceAssign(x, z, z)
+     o = Mul(y, r)
+    '''
+    x, y, z = _tensor("x", [4, 8]), _tensor("y", [4, 8]), _tensor("z", [4, 8])
+    desc = {"op_desc": [_op("Reciprocal", [x], _tensor("r", [4, 8])),
+                        _op("InplaceAssign", [x, z, z], _tensor("a", [4, 8])),
+                        _op("Mul", [y, _tensor("r", [4, 8])], _tensor("o", [4, 8]))],
+            "output_desc": [_tensor("a", [4, 8]), _tensor("o", [4, 8])]}
+    assert [op["name"] for op in _fold_reciprocal(desc)] == ["Reciprocal", "InplaceAssign", "Mul"]
+
+    data = {"x": np.random.uniform(1, 2, (4, 8)), "y": np.random.uniform(1, 2, (4, 8)),
+            "z": np.random.uniform(3, 4, (4, 8))}
+    _, o = _run(desc, data)
+    assert np.allclose(o, data["y"] / data["x"])
+
+
+def test_fold_sqrt_assign_rebind():
+    '''
+     the same holds for Reciprocal(Sqrt(x))
+
+     s = Sqrt(x)
+     a = InplaceAssign(x, z, z)
+     o = Reciprocal(s)
+    '''
+    x, z = _tensor("x", [4, 8]), _tensor("z", [4, 8])
+    desc = {"op_desc": [_op("Sqrt", [x], _tensor("s", [4, 8])),
+                        _op("InplaceAssign", [x, z, z], _tensor("a", [4, 8])),
+                        _op("Reciprocal", [_tensor("s", [4, 8])], _tensor("o", [4, 8]))],
+            "output_desc": [_tensor("a", [4, 8]), _tensor("o", [4, 8])]}
+    assert [op["name"] for op in _fold_reciprocal(desc)] == ["Sqrt", "InplaceAssign", "Reciprocal"]
+
+    data = {"x": np.random.uniform(1, 2, (4, 8)), "z": np.random.uniform(3, 4, (4, 8))}
+    _, o = _run(desc, data)
+    assert np.allclose(o, 1 / np.sqrt(data["x"]))
+
+
+if __name__ == '__main__':
+    test_fold_reciprocal_mul()
+    test_fold_reciprocal_fractal_mul()
+    test_fold_reciprocal_fractal_rebind()
+    test_fold_reciprocal_assign_rebind()
+    test_fold_sqrt_assign_rebind()
@@ -0,0 +1,72 @@
+# Copyright 2021 Huawei Technologies Co., Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from akg.utils import op_dsl
+from akg.utils.composite_op_helper import _gen_fused_op_compute
+
+
+def _tensor(name, shape, dtype="float32"):
+    return {"tensor_name": name, "shape": shape, "data_type": dtype, "format": "DefaultFormat"}
+
+
+def _op(name, inputs, output, attr=None):
+    return {"name": name, "input_desc": [[i] for i in inputs], "output_desc": [output], "attr": attr or []}
+
+
+def _run(desc, backend, inputs):
+    commands = []
+    _gen_fused_op_compute(desc, backend, commands)
+    scope = dict(vars(op_dsl), **inputs)
+    exec("\n".join(commands), scope)
+    return commands, [scope[output["tensor_name"]] for output in desc["output_desc"]]
+
+
+def _check_backend(backend):
+    '''
+     s = UnsortedSegmentSum(x, ids)     (computed in float64 by unsorted_segment_sum_np)
+     m = Mul(s, y)
+     a = Add(m, y)
+     o = Sqrt(a)
+    '''
+    x, ids, y = _tensor("x", [6, 4]), _tensor("ids", [6], "int32"), _tensor("y", [3, 4])
+    s, m, a, o = _tensor("s", [3, 4]), _tensor("m", [3, 4]), _tensor("a", [3, 4]), _tensor("o", [3, 4])
+    desc = {"op_desc": [_op("UnsortedSegmentSum", [x, ids], s, [{"name": "num_segments", "value": 3}]),
+                        _op("Mul", [s, y], m),
+                        _op("Add", [m, y], a),
+                        _op("Sqrt", [a], o)],
+            "output_desc": [o]}
+    data = {"x": np.random.uniform(1, 2, (6, 4)).astype(np.float32),
+            "ids": np.array([0, 2, 1, 0, 2, 1], np.int32),
+            "y": np.random.uniform(1, 2, (3, 4)).astype(np.float32)}
+    commands, outputs = _run(desc, backend, data)
+    assert commands.count("import numexpr") == (1 if backend == "numexpr" else 0)
+
+    segment_sum = np.zeros((3, 4))
+    np.add.at(segment_sum, data["ids"], data["x"])
+    assert outputs[0].dtype == np.float32
+    assert np.allclose(outputs[0], np.sqrt(segment_sum * data["y"] + data["y"]), rtol=1e-5)
+
+
+def test_fuse_elemwise_numexpr():
+    _check_backend("numexpr")
+
+
+def test_fuse_elemwise_numba():
+    _check_backend("numba")
+
+
+if __name__ == '__main__':
+    test_fuse_elemwise_numexpr()
+    test_fuse_elemwise_numba()